@@ -7,6 +7,8 @@ class Raw_Frame:
     ERROR = '*'
     INVALID = ' '
 
+    # timestamp is an integer in nanoseconds, divide by 1e9 for seconds
+
     def reset_self(self):
         self.timestamp = 0
         self.type = self.INVALID
@@ -21,7 +23,8 @@ class Raw_Frame:
             start = line.find(ord('{'))+1
             end = line.find(ord('}'))
             payload = line[start:end]
-            self.timestamp = int(payload[0:8], 16) / 1000.0
+            # milliseconds tick to nanoseconds
+            self.timestamp = int(payload[0:8], 16) * 1000000
             self.type = chr(payload[8])
             self.length = int(payload[9:11], 16)
             self.data = int(payload[12:20], 16)
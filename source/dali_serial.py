@@ -24,9 +24,9 @@ class DALI_Serial:
 
     def read_worker_thread(self):
         logger.debug("read_worker_thread started")
-        raw = DALI.Raw_Frame(self.transparent)
         while self.worker_runnning:
             line = self.port.readline()
+            raw = DALI.Raw_Frame(self.transparent)
             logger.debug("received a line from serial")
             raw.from_line(line)
             self.queue.put(raw)
@@ -44,6 +44,16 @@ class DALI_Serial:
         return self.queue.get(block=True)
 
 
+    def read_raw_frames(self, max_n=16):
+        frames = [self.queue.get(block=True)]
+        try:
+            while len(frames) < max_n:
+                frames.append(self.queue.get(block=False))
+        except queue.Empty:
+            pass
+        return frames
+
+
     def close(self):
         logger.debug("Close connection")
         self.worker_running = False
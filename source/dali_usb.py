@@ -1,11 +1,9 @@
-import errno
 import logging
-import queue
 import struct
 import threading
 import time
 
-import usb
+import usb1
 import DALI
 
 logger = logging.getLogger(__name__)
@@ -23,77 +21,206 @@ DALI_USB_TYPE_24BIT = 0x06
 DALI_USB_TYPE_STATUS = 0x07
 DALI_USB_RECEIVE_MASK = 0x70
 
+# timeouts in milliseconds
+DALI_USB_READ_TIMEOUT = 200
+DALI_USB_WRITE_TIMEOUT = 1000
+
+# number of read transfers kept queued in the kernel at any time
+DALI_USB_READ_TRANSFERS = 4
+
+# dr sn ?? ty ?? ec ad oc, padded to the 64 byte packet size
+_WRITE_STRUCT = struct.Struct("BBxBxBBB" + (64 - 8) * "x")
+
+# dr ty ?? ec ad cm st st sn of a received packet
+_RX_HEADER = struct.Struct("BBxBBBxxB")
+
+# big endian payloads, 16 bit at [4:6], 24 bit masked out of [2:6]
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+
+# status code in a received status frame -> DALIError code
+_STATUS_ERRORS = {
+    0x03: DALI.DALIError.FRAME,
+    0x04: DALI.DALIError.RECOVER,
+}
+
+# received type -> (frame length, payload decoder)
+# a length of None marks a status frame, the decoder then returns the error code
+_RX_DECODERS = {
+    DALI_USB_RECEIVE_MASK + DALI_USB_TYPE_8BIT: (8, lambda data: data[5]),
+    DALI_USB_RECEIVE_MASK + DALI_USB_TYPE_16BIT: (16, lambda data: _U16.unpack_from(data, 4)[0]),
+    DALI_USB_RECEIVE_MASK + DALI_USB_TYPE_24BIT: (24, lambda data: _U32.unpack_from(data, 2)[0] & 0xFFFFFF),
+    DALI_USB_RECEIVE_MASK + DALI_USB_TYPE_STATUS: (None, lambda data: _STATUS_ERRORS.get(data[5], DALI.DALIError.GENERAL)),
+}
+
+
+class DALIUsbNotFoundError(usb1.USBErrorNotFound):
+    """USBErrorNotFound that also says what was not found.
+    """
+    def __init__(self, message):
+        super().__init__()
+        self.message = message
+
+    def __str__(self):
+        return F"{self.message} ({super().__str__()})"
+
+
+class SPSCRing:
+    """Ring of preallocated Raw_Frame slots, one producer and one consumer.
+
+    Only the producer moves head and only the consumer moves tail, so no lock
+    is taken per frame. The event only wakes a consumer waiting on an empty ring.
+    Slots handed out by get() or get_batch() are released by the next call.
+    """
+    def __init__(self, size=64):
+        self._buf = [DALI.Raw_Frame() for _ in range(size)]
+        self._size = size
+        self._head = 0
+        self._tail = 0
+        self._read = 0
+        self._not_empty = threading.Event()
+
+    def empty(self):
+        return self._head == self._read
+
+    def clear(self):
+        """Drop all published frames, to be called from the consumer side.
+        """
+        self._read = self._head
+        self._tail = self._read
+
+    def reserve(self):
+        """Return the next free slot to fill in place, None if the ring is full.
+        """
+        head = self._head
+        if (head + 1) % self._size == self._tail:
+            return None
+        return self._buf[head]
+
+    def publish(self):
+        """Hand the slot returned by reserve() over to the consumer.
+        """
+        self._head = (self._head + 1) % self._size
+        self._not_empty.set()
+
+    def _wait(self):
+        self._tail = self._read
+        while self._head == self._read:
+            self._not_empty.wait()
+            self._not_empty.clear()
+
+    def get(self):
+        """Return the oldest frame, block while the ring is empty.
+        """
+        self._wait()
+        read = self._read
+        self._read = (read + 1) % self._size
+        return self._buf[read]
+
+    def get_batch(self, max_n):
+        """Return up to max_n frames, block while the ring is empty.
+        """
+        self._wait()
+        read = self._read
+        n = min((self._head - read) % self._size, max_n)
+        self._read = (read + n) % self._size
+        return [self._buf[(read + i) % self._size] for i in range(n)]
+
 
 class DALI_Usb:
     def __init__(self, vendor=DALI_USB_VENDOR, product=DALI_USB_PRODUCT):
         # lookup devices by vendor and DALI_USB_PRODUCT
         self.interface = 0
-        self.queue = queue.Queue(maxsize=40)
-        self.worker_running = False
+        self.queue = SPSCRing()
+        self.stop_reading = threading.Event()
+        self.worker_thread = None
         self.message_counter = 1
+        # reused for every transmission, libusb1 sends a bytearray without copying
+        self.tx_buffer = bytearray(_WRITE_STRUCT.size)
+        # 16 bit commands only need sn, ad and oc filled in
+        self.tx_buffer_16bit = bytearray(_WRITE_STRUCT.pack(
+            DALI_USB_DIRECTION_TO_DALI, 0, DALI_USB_TYPE_16BIT, 0x00, 0x00, 0x00))
 
         logger.debug("Try to discover DALI interfaces")
-        devices = [dev for dev in usb.core.find(
-            find_all=True,
-            idVendor=vendor,
-            idProduct=product
-        )]
-
-        logger.info(F"DALI interfaces found: {devices}")
+        self.context = usb1.USBContext()
+        self.context.open()
+        self.handle = self.context.openByVendorIDAndProductID(vendor, product, skip_on_error=True)
 
         # if not found
-        if not devices:
-            raise usb.core.USBError("DALI interface not found")
+        if self.handle is None:
+            logger.error("DALI interface not found")
+            self.context.close()
+            raise DALIUsbNotFoundError("DALI interface not found")
 
-        # use first device from list
-        self.device = devices[0]
-        self.device.reset()
+        self.device = self.handle.getDevice()
+        logger.info(F"DALI interface found: {self.device}")
+        self.handle.resetDevice()
 
         # detach kernel driver if necessary
-        if self.device.is_kernel_driver_active(self.interface) is True:
-            self.device.detach_kernel_driver(self.interface)
+        if self.handle.kernelDriverActive(self.interface):
+            self.handle.detachKernelDriver(self.interface)
 
         # set device configuration
-        self.device.set_configuration()
+        configuration = self.device[0]
+        self.handle.setConfiguration(configuration.getConfigurationValue())
 
         # claim interface
-        usb.util.claim_interface(self.device, self.interface)
-
-        # get active configuration
-        cfg = self.device.get_active_configuration()
-        intf = cfg[(0, 0)]
+        self.handle.claimInterface(self.interface)
 
         # get read and write endpoints
-        self.ep_write = usb.util.find_descriptor(
-            intf,
-            custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_OUT
-        )
-
-        self.ep_read = usb.util.find_descriptor(
-            intf,
-            custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_IN
-        )
-
-        if not self.ep_read or not self.ep_write:
-            raise usb.core.USBError(F"Could not determine read or write endpoint on {self.device}")
-
-        # read pending messages and disregard
-        try:
-            while True:
-                self.ep_read.read(self.ep_read.wMaxPacketSize, timeout=10)
+        self.ep_write = None
+        self.ep_read = None
+        for endpoint in configuration[self.interface][0]:
+            address = endpoint.getAddress()
+            if (address & usb1.ENDPOINT_DIR_MASK) == usb1.ENDPOINT_OUT:
+                self.ep_write = address
+            else:
+                self.ep_read = address
+                self.max_packet_size = endpoint.getMaxPacketSize()
+
+        if self.ep_read is None or self.ep_write is None:
+            logger.error(F"Could not determine read or write endpoint on {self.device}")
+            self.handle.close()
+            self.context.close()
+            raise DALIUsbNotFoundError(F"Could not determine read or write endpoint on {self.device}")
+
+        # bound once, these are called for every command and frame
+        self.bulk_read = self.handle.bulkRead
+        self.bulk_write = self.handle.bulkWrite
+
+        # read pending messages and disregard, the first timeout means none are left
+        for _ in range(8):
+            try:
+                self.bulk_read(self.ep_read, self.max_packet_size, timeout=1)
                 logger.info("DALI interface - disregard pending messages")
-        except Exception:
-            pass
-
-    def read_raw(self, timeout=None):
+            except usb1.USBErrorTimeout:
+                break
+
+        # asynchronous reads, each transfer reuses its own buffer for every frame
+        self.rx_transfers = []
+        for _ in range(DALI_USB_READ_TRANSFERS):
+            transfer = self.handle.getTransfer()
+            transfer.setBulk(
+                self.ep_read,
+                bytearray(self.max_packet_size),
+                callback=self.receive_callback,
+                timeout=DALI_USB_READ_TIMEOUT
+            )
+            self.rx_transfers.append(transfer)
+
+    def read_raw(self, timeout=DALI_USB_READ_TIMEOUT):
         """Read data from USB device.
+            Not available once start_read() was called, the read transfers
+            of the worker would compete for the same packets.
         """
-        return self.ep_read.read(self.ep_read.wMaxPacketSize, timeout=timeout)
+        if self.worker_thread is not None:
+            raise Exception("read_raw() can not be used while the read worker is running")
+        return self.bulk_read(self.ep_read, self.max_packet_size, timeout=timeout)
 
     def write(self, cmd):
         """ Write data to DALI bus.
             cmd : tupel of bytes to send
-            
+
             Data expected by DALI USB
             dr sn ?? ty ?? ec ad oc.. .. .. .. .. .. .. ..
             12 xx 00 03 00 00 ff 08 00 00 00 00 00 00 00 00
@@ -105,19 +232,24 @@ class DALI_Usb:
             ad: address
             oc: opcode
         """
-        dr = DALI_USB_DIRECTION_TO_DALI
         sn = self.message_counter
-        self.message_counter = (self.message_counter + 1) & 0xff
+        self.message_counter = (sn + 1) & 0xff
+        if len(cmd) == 2:
+            # by far the most common command, direction and type are preset
+            data = self.tx_buffer_16bit
+            data[1] = sn
+            data[6] = cmd[0]
+            data[7] = cmd[1]
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(F"DALI[OUT]: SN=0x{sn:02X} TY=0x{DALI_USB_TYPE_16BIT:02X} EC=0x00 AD=0x{cmd[0]:02X} OC=0x{cmd[1]:02X}")
+            return self.bulk_write(self.ep_write, data, timeout=DALI_USB_WRITE_TIMEOUT)
+
+        dr = DALI_USB_DIRECTION_TO_DALI
         if len(cmd) == 3:
             ec = cmd[0]
             ad = cmd[1]
             oc = cmd[2]
             ty = DALI_USB_TYPE_24BIT
-        elif len(cmd) == 2:
-            ec = 0x00
-            ad = cmd[0]
-            oc = cmd[1]
-            ty = DALI_USB_TYPE_16BIT
         elif len(cmd) == 1:
             ec = 0x00
             ad = 0x00
@@ -126,84 +258,110 @@ class DALI_Usb:
         else:
             raise Exception(F"DALI commands must be 1-3 bytes long but {cmd} is {len(cmd)} bytes long")
 
-        data = struct.pack("BBxBxBBB" + (64 - 8) * 'x', dr, sn, ty, ec, ad, oc)
+        _WRITE_STRUCT.pack_into(self.tx_buffer, 0, dr, sn, ty, ec, ad, oc)
 
-        logger.debug(F"DALI[OUT]: SN=0x{sn:02X} TY=0x{ty:02X} EC=0x{ec:02X} AD=0x{ad:02X} OC=0x{oc:02X}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(F"DALI[OUT]: SN=0x{sn:02X} TY=0x{ty:02X} EC=0x{ec:02X} AD=0x{ad:02X} OC=0x{oc:02X}")
 
-        return self.ep_write.write(data)
+        return self.bulk_write(self.ep_write, self.tx_buffer, timeout=DALI_USB_WRITE_TIMEOUT)
 
     def close(self):
         """Close connection to USB device.
         """
-        self.worker_running = False
-        usb.util.dispose_resources(self.device)
+        self.stop_reading.set()
+        if self.worker_thread is not None:
+            # wake the worker from handleEventsTimeout() instead of waiting for it to time out
+            self.context.interruptEventHandler()
+            self.worker_thread.join()
+            self.worker_thread = None
+        # cancels the read transfers still in flight
+        self.handle.close()
+        self.context.close()
+
+    def receive_callback(self, transfer):
+        """Process a completed read transfer and hand it back to libusb.
+        """
+        status = transfer.getStatus()
+        if status == usb1.TRANSFER_COMPLETED:
+            self.process_frame(transfer.getBuffer()[:transfer.getActualLength()])
+        elif status != usb1.TRANSFER_TIMED_OUT:
+            if status not in (usb1.TRANSFER_CANCELLED, usb1.TRANSFER_NO_DEVICE):
+                logger.error(F"DALI interface - read transfer failed with status {status}")
+            return
+        if not self.stop_reading.is_set():
+            transfer.submit()
+
+    def process_frame(self, data):
+        """ raw data received from DALI USB:
+        dr ty ?? ec ad cm st st sn .. .. .. .. .. .. ..
+        11 73 00 00 ff 93 ff ff 00 00 00 00 00 00 00 00
+
+        dr: [0]: direction
+            0x11 = DALI side
+            0x12 = USB side
+        ty: [1]: type
+        ec: [2]: ecommand
+        ad: [3]: address
+        cm: [4] command
+            also serves as response code for 72
+        st: [5] status
+            internal status code, value unknown
+        sn: [6] seqnum
+        """
+        if len(data) >= _RX_HEADER.size:
+            dr, ty, ec, ad, oc, sn = _RX_HEADER.unpack_from(data)
+            if dr == DALI_USB_DIRECTION_FROM_DALI:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(F"DALI[IN]: SN=0x{sn:02X} TY=0x{ty:02X} EC=0x{ec:02X} AD=0x{ad:02X} OC=0x{oc:02X}")
+                entry = _RX_DECODERS.get(ty)
+                if entry is None:
+                    return
+                raw = self.queue.reserve()
+                if raw is None:
+                    logger.warning("DALI interface - receive buffer full, frame dropped")
+                    return
+                length, decode = entry
+                raw.timestamp = time.monotonic_ns()
+                if length is None:
+                    raw.type = raw.ERROR
+                    raw.length = decode(data)
+                    raw.data = 0
+                else:
+                    raw.type = raw.COMMAND
+                    raw.length = length
+                    raw.data = decode(data)
+                self.queue.publish()
+            elif dr == DALI_USB_DIRECTION_TO_DALI:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(F"DALI[OUT]: SN=0x{sn:02X} TY=0x{ty:02X} EC=0x{ec:02X} AD=0x{ad:02X} OC=0x{oc:02X}")
 
     def read_worker_thread(self):
         logger.debug("read_worker_thread() started")
-        raw = DALI.Raw_Frame()
-        while self.worker_running:
+        for transfer in self.rx_transfers:
+            transfer.submit()
+        stopped = self.stop_reading.is_set
+        handle_events = self.context.handleEventsTimeout
+        while not stopped():
             try:
-                data = self.read_raw(timeout=200)
-                """ raw data received from DALI USB:
-                dr ty ?? ec ad cm st st sn .. .. .. .. .. .. ..
-                11 73 00 00 ff 93 ff ff 00 00 00 00 00 00 00 00
-
-                dr: [0]: direction
-                    0x11 = DALI side
-                    0x12 = USB side
-                ty: [1]: type
-                ec: [2]: ecommand
-                ad: [3]: address
-                cm: [4] command
-                    also serves as response code for 72
-                st: [5] status
-                    internal status code, value unknown
-                sn: [6] seqnum
-                """
-                if data:
-                    if data[0] == DALI_USB_DIRECTION_FROM_DALI:
-                        logger.debug(F"DALI[IN]: SN=0x{data[8]:02X} TY=0x{data[1]:02X} EC=0x{data[3]:02X} AD=0x{data[4]:02X} OC=0x{data[5]:02X}")
-                        raw.type = raw.COMMAND
-                        raw.timestamp = time.time()
-                        if data[1] == (DALI_USB_RECEIVE_MASK + DALI_USB_TYPE_8BIT):
-                            raw.length = 8
-                            raw.data = data[5]
-                        elif data[1] == (DALI_USB_RECEIVE_MASK + DALI_USB_TYPE_16BIT):
-                            raw.length = 16
-                            raw.data = data[5] + (data[4]<<8)
-                        elif data[1] == (DALI_USB_RECEIVE_MASK + DALI_USB_TYPE_24BIT):
-                            raw.length = 24
-                            raw.data = data[5] + (data[4]<<8) + (data[3]<<16)
-                        elif data[1] == (DALI_USB_RECEIVE_MASK + DALI_USB_TYPE_STATUS):
-                            raw.type = raw.ERROR
-                            raw.data = 0
-                            if data[5] == 0x04:
-                                raw.length = DALI.DALIError.RECOVER
-                            elif data[5] == 0x03:
-                                raw.length = DALI.DALIError.FRAME
-                            else:
-                                raw.length = DALI.DALIError.GENERAL
-                        self.queue.put(raw)
-
-                    if data[0] == DALI_USB_DIRECTION_TO_DALI:
-                        logger.debug(F"DALI[OUT]: SN=0x{data[8]:02X} TY=0x{data[1]:02X} EC=0x{data[3]:02X} AD=0x{data[4]:02X} OC=0x{data[5]:02X}")
-
-            except usb.USBError as e:
-                if e.errno not in (errno.ETIMEDOUT, errno.ENODEV):
-                    raise e
+                handle_events(DALI_USB_READ_TIMEOUT / 1000)
+            except usb1.USBErrorInterrupted:
+                pass
 
     def start_read(self):
         logger.debug("Start read")
-        self.worker_running = True
-        thread = threading.Thread(target=self.read_worker_thread, args=())
-        thread.daemon = True
-        thread.start()
+        self.stop_reading.clear()
+        self.worker_thread = threading.Thread(target=self.read_worker_thread, args=())
+        self.worker_thread.daemon = True
+        self.worker_thread.start()
 
 
     def read_raw_frame(self):
-        return self.queue.get(block=True)
+        return self.queue.get()
+
+
+    def read_raw_frames(self, max_n=16):
+        return self.queue.get_batch(max_n)
 
 
     def clear_buffers(self):
-        while not self.queue.empty():
-            self.queue.get(block=False)
+        self.queue.clear()
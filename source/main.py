@@ -1,72 +1,96 @@
 import getopt
+import os
 import sys
 import logging
 from datetime import datetime
 
-from termcolor import cprint
-
 import DALI
 import dali_serial
 import dali_usb
 
+# ANSI escape sequences, as used by termcolor
+YELLOW = "\x1b[33m"
+GREEN = "\x1b[32m"
+WHITE = "\x1b[97m"
+RED = "\x1b[31m"
+RESET = "\x1b[0m"
+
+
+def can_use_color():
+    """Same decision as termcolor: environment overrides first, then the terminal.
+    """
+    if os.environ.get("ANSI_COLORS_DISABLED") or os.environ.get("NO_COLOR"):
+        return False
+    if os.environ.get("FORCE_COLOR"):
+        return True
+    if os.environ.get("TERM") == "dumb":
+        return False
+    return sys.stdout.isatty()
 
-def print_local_time_color(enabled):
+
+def format_local_time_color(enabled):
     if enabled:
         time_string = datetime.now().strftime("%H:%M:%S")
-        cprint(F"{time_string} | ", color="yellow", end="")
+        return F"{YELLOW}{time_string} | {RESET}"
+    return ""
 
 
-def print_local_time(enabled):
+def format_local_time(enabled):
     if enabled:
         time_string = datetime.now().strftime("%H:%M:%S")
-        print(F"{time_string} | ", end="")
+        return F"{time_string} | "
+    return ""
 
 
-def print_command_color(absolute_time, timestamp, delta, dali_command):
-    print_local_time_color(absolute_time)
-    cprint(F"{timestamp:.03f} | {delta:8.03f} | {dali_command} | ", color="green", end="")
-    cprint(F"{dali_command.cmd()}", color="white")
+def format_command_color(absolute_time, timestamp, delta, dali_command):
+    return (F"{format_local_time_color(absolute_time)}"
+            F"{GREEN}{timestamp / 1e9:.03f} | {delta / 1e9:8.03f} | {dali_command} | {RESET}"
+            F"{WHITE}{dali_command.cmd()}{RESET}\n").encode()
 
 
-def print_command(absolute_time, timestamp, delta, dali_command):
-    print_local_time(absolute_time)
-    print(F"{timestamp:.03f} | {delta:8.03f} | {dali_command} | {dali_command.cmd()}")
+def format_command(absolute_time, timestamp, delta, dali_command):
+    return (F"{format_local_time(absolute_time)}"
+            F"{timestamp / 1e9:.03f} | {delta / 1e9:8.03f} | {dali_command} | {dali_command.cmd()}\n").encode()
 
 
-def print_error_color(absolute_time, raw, delta):
-    print_local_time_color(absolute_time)
-    cprint(F"{raw.timestamp:.03f} | {delta:8.03f} | ", color="green", end="")
-    cprint(F"{DALI.DALIError(raw.length, raw.data)}", color="red")
+def format_error_color(absolute_time, raw, delta):
+    return (F"{format_local_time_color(absolute_time)}"
+            F"{GREEN}{raw.timestamp / 1e9:.03f} | {delta / 1e9:8.03f} | {RESET}"
+            F"{RED}{DALI.DALIError(raw.length, raw.data)}{RESET}\n").encode()
 
 
-def print_error(absolute_time, raw, delta):
-    print_local_time(absolute_time)
-    print(F"{raw.timestamp:.03f} | {delta:8.03f} | {DALI.DALIError(raw.length, raw.data)}")
+def format_error(absolute_time, raw, delta):
+    return (F"{format_local_time(absolute_time)}"
+            F"{raw.timestamp / 1e9:.03f} | {delta / 1e9:8.03f} | {DALI.DALIError(raw.length, raw.data)}\n").encode()
 
 
 def main(source, use_color, absolute_time):
     last_timestamp = 0
     delta = 0
     active_device_type = DALI.DeviceType.NONE
+    # frames are written as bytes, flush what print() may still hold
+    sys.stdout.flush()
+    stdout_write = sys.stdout.buffer.write
+    stdout_flush = sys.stdout.buffer.flush
+    use_color = use_color and can_use_color()
+    command_formatter = format_command_color if use_color else format_command
+    error_formatter = format_error_color if use_color else format_error
     source.start_read()
     while True:
-        raw = source.read_raw_frame()
-        if not raw.type == raw.INVALID:
-            if last_timestamp != 0:
-                delta = raw.timestamp - last_timestamp
-            if raw.type == raw.COMMAND:
-                dali_command = DALI.Decode(raw, active_device_type)
-                if use_color:
-                    print_command_color(absolute_time, raw.timestamp, delta, dali_command)
-                else:
-                    print_command(absolute_time, raw.timestamp, delta, dali_command)
-                active_device_type = dali_command.get_next_device_type()
-            else:
-                if use_color:
-                    print_error_color(absolute_time, raw, delta)
+        output = bytearray()
+        for raw in source.read_raw_frames():
+            if not raw.type == raw.INVALID:
+                if last_timestamp != 0:
+                    delta = raw.timestamp - last_timestamp
+                if raw.type == raw.COMMAND:
+                    dali_command = DALI.Decode(raw, active_device_type)
+                    output += command_formatter(absolute_time, raw.timestamp, delta, dali_command)
+                    active_device_type = dali_command.get_next_device_type()
                 else:
-                    print_error(absolute_time, raw, delta)
-            last_timestamp = raw.timestamp
+                    output += error_formatter(absolute_time, raw, delta)
+                last_timestamp = raw.timestamp
+        stdout_write(output)
+        stdout_flush()
 
 
 def show_version():
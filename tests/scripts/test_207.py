@@ -8,76 +8,81 @@ sys.path.append(os.path.join(here, '../../source'))
 import DALI
 
 # refer to iec62386 207 Table 6
-@pytest.mark.parametrize("name,opcode",
-    [("REFERENCE SYSTEM POWER", 0xE0),
-     ("SELECT DIMMING CURVE (DTR0)", 0xE3),
-     ("SET FAST FADE TIME (DTR0)", 0xE4),
-     ("QUERY CONTROL GEAR TYPE", 0xED),
-     ("QUERY DIMMING CURVE", 0xEE),
-     ("QUERY FEATURES", 0xF0),
-     ("QUERY LOAD DECREASE", 0xF4),
-     ("QUERY LOAD INCREASE", 0xF5),
-     ("QUERY THERMAL SHUTDOWN", 0xF7),
-     ("QUERY THERMAL OVERLOAD", 0xF8),
-     ("QUERY REFERENCE RUNNING", 0xF9),
-     ("QUERY REFERENCE MEASUREMENT FAILED", 0xFA),
-     ("QUERY FAST FADE TIME", 0xFD),
-     ("QUERY MIN FAST FADE TIME", 0xFE),
-     ("QUERY EXTENDED VERSION NUMBER", 0xFF)
-    ]
-)
-def test_dt6_command(name,opcode):
-    frame = DALI.Raw_Frame()
-    frame.length = 16
-    # broadcast
-    frame.data = 0xFF00 + opcode
-    decoded_command = DALI.Decode(frame, DALI.DeviceType.LED)
-    target_command = "BC".ljust(10) + name
-    assert decoded_command.cmd() == target_command
-    # broadcast unadressed
-    frame.data = 0xFD00 + opcode
-    decoded_command = DALI.Decode(frame, DALI.DeviceType.LED)
-    target_command = "BC unadr.".ljust(10) + name
-    assert decoded_command.cmd() == target_command
-    # short address
-    for short_address in range (0,0x40):
-        frame.data = 0x0100 + (short_address << 9) + opcode
-        decoded_command = DALI.Decode(frame, DALI.DeviceType.LED)
-        target_command = F"A{short_address:02}".ljust(10) + name
-        assert decoded_command.cmd() == target_command
-    # group address
-    for group_address in range (0,0x10):
-        frame.data = 0x8100 + (group_address << 9) + opcode
-        decoded_command = DALI.Decode(frame, DALI.DeviceType.LED)
-        target_command = F"G{group_address:02}".ljust(10) + name
-        assert decoded_command.cmd() == target_command
-
-@pytest.mark.parametrize("opcode",[
+DT6_COMMANDS = [
+    ("REFERENCE SYSTEM POWER", 0xE0),
+    ("SELECT DIMMING CURVE (DTR0)", 0xE3),
+    ("SET FAST FADE TIME (DTR0)", 0xE4),
+    ("QUERY CONTROL GEAR TYPE", 0xED),
+    ("QUERY DIMMING CURVE", 0xEE),
+    ("QUERY FEATURES", 0xF0),
+    ("QUERY LOAD DECREASE", 0xF4),
+    ("QUERY LOAD INCREASE", 0xF5),
+    ("QUERY THERMAL SHUTDOWN", 0xF7),
+    ("QUERY THERMAL OVERLOAD", 0xF8),
+    ("QUERY REFERENCE RUNNING", 0xF9),
+    ("QUERY REFERENCE MEASUREMENT FAILED", 0xFA),
+    ("QUERY FAST FADE TIME", 0xFD),
+    ("QUERY MIN FAST FADE TIME", 0xFE),
+    ("QUERY EXTENDED VERSION NUMBER", 0xFF)
+]
+
+DT6_UNDEFINED_CODES = [
     0xE1,0xE2,0xE5,0xE6,0xE7,0xE8,0xE9,0xEA,0xEB,0xEC,0xEF,
-    0xF2,0xF3,0xF6,0xFB,0xFC])
-def test_dt6_undefined_codes(opcode):
+    0xF2,0xF3,0xF6,0xFB,0xFC]
+
+
+def decode_dt6(data):
     frame = DALI.Raw_Frame()
     frame.length = 16
-    # broadcast
-    frame.data = 0xFF00 + opcode
-    decoded_command = DALI.Decode(frame, DALI.DeviceType.LED)
+    frame.data = data
+    return DALI.Decode(frame, DALI.DeviceType.LED).cmd()
+
+
+@pytest.mark.parametrize("name,opcode", DT6_COMMANDS)
+def test_dt6_command_broadcast(name,opcode):
+    assert decode_dt6(0xFF00 + opcode) == "BC".ljust(10) + name
+
+
+@pytest.mark.parametrize("name,opcode", DT6_COMMANDS)
+def test_dt6_command_broadcast_unaddressed(name,opcode):
+    assert decode_dt6(0xFD00 + opcode) == "BC unadr.".ljust(10) + name
+
+
+@pytest.mark.parametrize("short_address", range(0,0x40))
+@pytest.mark.parametrize("name,opcode", DT6_COMMANDS)
+def test_dt6_command_short_address(name,opcode,short_address):
+    target_command = F"A{short_address:02}".ljust(10) + name
+    assert decode_dt6(0x0100 + (short_address << 9) + opcode) == target_command
+
+
+@pytest.mark.parametrize("group_address", range(0,0x10))
+@pytest.mark.parametrize("name,opcode", DT6_COMMANDS)
+def test_dt6_command_group_address(name,opcode,group_address):
+    target_command = F"G{group_address:02}".ljust(10) + name
+    assert decode_dt6(0x8100 + (group_address << 9) + opcode) == target_command
+
+
+@pytest.mark.parametrize("opcode", DT6_UNDEFINED_CODES)
+def test_dt6_undefined_codes_broadcast(opcode):
     target_command = "BC".ljust(10) + "---"
-    assert decoded_command.cmd()[:len(target_command)] == target_command
-    # broadcast unadressed
-    frame.data = 0xFD00 + opcode
-    decoded_command = DALI.Decode(frame, DALI.DeviceType.LED)
+    assert decode_dt6(0xFF00 + opcode)[:len(target_command)] == target_command
+
+
+@pytest.mark.parametrize("opcode", DT6_UNDEFINED_CODES)
+def test_dt6_undefined_codes_broadcast_unaddressed(opcode):
     target_command = "BC unadr.".ljust(10) + "---"
-    assert decoded_command.cmd()[:len(target_command)] == target_command
-    # short address
-    for short_address in range (0,0x40):
-        frame.data = 0x0100 + (short_address << 9) + opcode
-        decoded_command = DALI.Decode(frame, DALI.DeviceType.LED)
-        target_command = F"A{short_address:02}".ljust(10) + "---"
-        assert decoded_command.cmd()[:len(target_command)] == target_command
-    # group address
-    for group_address in range (0,0x10):
-        frame.data = 0x8100 + (group_address << 9) + opcode
-        decoded_command = DALI.Decode(frame, DALI.DeviceType.LED)
-        target_command = F"G{group_address:02}".ljust(10) + "---"
-        assert decoded_command.cmd()[:len(target_command)] == target_command
+    assert decode_dt6(0xFD00 + opcode)[:len(target_command)] == target_command
+
+
+@pytest.mark.parametrize("short_address", range(0,0x40))
+@pytest.mark.parametrize("opcode", DT6_UNDEFINED_CODES)
+def test_dt6_undefined_codes_short_address(opcode,short_address):
+    target_command = F"A{short_address:02}".ljust(10) + "---"
+    assert decode_dt6(0x0100 + (short_address << 9) + opcode)[:len(target_command)] == target_command
+
 
+@pytest.mark.parametrize("group_address", range(0,0x10))
+@pytest.mark.parametrize("opcode", DT6_UNDEFINED_CODES)
+def test_dt6_undefined_codes_group_address(opcode,group_address):
+    target_command = F"G{group_address:02}".ljust(10) + "---"
+    assert decode_dt6(0x8100 + (group_address << 9) + opcode)[:len(target_command)] == target_command
@@ -0,0 +1,35 @@
+import pytest
+import os
+import sys
+# locate the DALI module
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '../../source'))
+
+import DALI
+
+
+@pytest.mark.parametrize("tick_ms", [0x00000000, 0x0000ABCD, 0xFFFFFFFF])
+def test_command_line(tick_ms):
+    frame = DALI.Raw_Frame()
+    frame.from_line(F"{{{tick_ms:08X}-10 0000FF05}}\n".encode())
+    assert frame.timestamp == tick_ms * 1000000
+    assert isinstance(frame.timestamp, int)
+    assert frame.type == frame.COMMAND
+    assert frame.length == 16
+    assert frame.data == 0xFF05
+
+
+def test_error_line():
+    frame = DALI.Raw_Frame()
+    frame.from_line(b"noise {00001234*08 00000000}\n")
+    assert frame.timestamp == 0x1234 * 1000000
+    assert frame.type == frame.ERROR
+    assert frame.length == DALI.DALIError.RECOVER
+    assert frame.data == 0
+
+
+def test_invalid_line():
+    frame = DALI.Raw_Frame()
+    frame.from_line(b"{0000XYZW-10 0000FF05}\n")
+    assert frame.type == frame.INVALID
+    assert frame.timestamp == 0
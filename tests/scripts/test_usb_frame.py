@@ -0,0 +1,101 @@
+import pytest
+import os
+import sys
+# locate the DALI module
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '../../source'))
+
+import DALI
+import dali_usb
+
+
+@pytest.fixture
+def usb():
+    # process_frame() only needs the receive ring, no device is opened
+    usb = dali_usb.DALI_Usb.__new__(dali_usb.DALI_Usb)
+    usb.queue = dali_usb.SPSCRing()
+    return usb
+
+
+# dr ty ?? ec ad cm st st sn, padded to 64 bytes
+# byte 2 is set so the 24 bit decoder has to mask it off
+def packet(direction, frame_type, ecommand=0x00, address=0x00, opcode=0x00, seqnum=0x00):
+    data = bytearray(64)
+    data[0] = direction
+    data[1] = frame_type
+    data[2] = 0xAA
+    data[3] = ecommand
+    data[4] = address
+    data[5] = opcode
+    data[8] = seqnum
+    return data
+
+
+def received(ecommand, address, opcode, frame_type):
+    return packet(dali_usb.DALI_USB_DIRECTION_FROM_DALI, dali_usb.DALI_USB_RECEIVE_MASK + frame_type,
+                  ecommand, address, opcode)
+
+
+def test_8bit_frame(usb):
+    usb.process_frame(received(0x12, 0x34, 0x56, dali_usb.DALI_USB_TYPE_8BIT))
+    frame = usb.read_raw_frame()
+    assert frame.type == frame.COMMAND
+    assert frame.length == 8
+    assert frame.data == 0x56
+
+
+def test_16bit_frame(usb):
+    usb.process_frame(received(0x12, 0x34, 0x56, dali_usb.DALI_USB_TYPE_16BIT))
+    frame = usb.read_raw_frame()
+    assert frame.type == frame.COMMAND
+    assert frame.length == 16
+    assert frame.data == 0x3456
+
+
+def test_24bit_frame(usb):
+    usb.process_frame(received(0x12, 0x34, 0x56, dali_usb.DALI_USB_TYPE_24BIT))
+    frame = usb.read_raw_frame()
+    assert frame.type == frame.COMMAND
+    assert frame.length == 24
+    assert frame.data == 0x123456
+
+
+def test_frame_timestamp(usb):
+    usb.process_frame(received(0x00, 0xFF, 0x00, dali_usb.DALI_USB_TYPE_16BIT))
+    frame = usb.read_raw_frame()
+    assert isinstance(frame.timestamp, int)
+    assert frame.timestamp > 0
+
+
+@pytest.mark.parametrize("status,error_code",
+    [(0x03, DALI.DALIError.FRAME),
+     (0x04, DALI.DALIError.RECOVER),
+     (0x01, DALI.DALIError.GENERAL)
+    ]
+)
+def test_status_frame(usb, status, error_code):
+    usb.process_frame(received(0x00, 0x00, status, dali_usb.DALI_USB_TYPE_STATUS))
+    frame = usb.read_raw_frame()
+    assert frame.type == frame.ERROR
+    assert frame.length == error_code
+    assert frame.data == 0
+
+
+@pytest.mark.parametrize("frame_type", [0x01, 0x04, 0x7F, dali_usb.DALI_USB_TYPE_16BIT])
+def test_unknown_type_is_dropped(usb, frame_type):
+    usb.process_frame(packet(dali_usb.DALI_USB_DIRECTION_FROM_DALI, frame_type, 0x00, 0xFF, 0x00))
+    assert usb.queue.empty()
+
+
+def test_short_packet_is_dropped(usb):
+    data = received(0x12, 0x34, 0x56, dali_usb.DALI_USB_TYPE_16BIT)
+    usb.process_frame(data[:8])
+    usb.process_frame(bytearray())
+    assert usb.queue.empty()
+
+
+def test_usb_side_frame_is_not_published(usb):
+    usb.process_frame(packet(dali_usb.DALI_USB_DIRECTION_TO_DALI,
+                             dali_usb.DALI_USB_RECEIVE_MASK + dali_usb.DALI_USB_TYPE_16BIT,
+                             0x00, 0xFF, 0x00))
+    assert usb.queue.empty()
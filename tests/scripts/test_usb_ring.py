@@ -0,0 +1,118 @@
+import pytest
+import os
+import sys
+import threading
+import time
+# locate the DALI module
+here = os.path.dirname(__file__)
+sys.path.append(os.path.join(here, '../../source'))
+
+import dali_usb
+
+
+def publish(ring, *values):
+    for value in values:
+        slot = ring.reserve()
+        assert slot is not None
+        slot.data = value
+        ring.publish()
+
+
+def test_empty_ring():
+    ring = dali_usb.SPSCRing(4)
+    assert ring.empty()
+    publish(ring, 1)
+    assert not ring.empty()
+    assert ring.get().data == 1
+    assert ring.empty()
+
+
+def test_full_ring_returns_none():
+    ring = dali_usb.SPSCRing(4)
+    publish(ring, 1, 2, 3)
+    assert ring.reserve() is None
+
+
+def test_returned_slot_is_held_until_next_call():
+    ring = dali_usb.SPSCRing(4)
+    publish(ring, 1, 2, 3)
+    assert ring.get().data == 1
+    # the slot just handed out is not released yet
+    assert ring.reserve() is None
+    assert ring.get().data == 2
+    # the next call released the first slot, making room for one frame
+    assert ring.reserve() is not None
+
+
+def test_batch_is_held_until_next_call():
+    ring = dali_usb.SPSCRing(4)
+    publish(ring, 1, 2, 3)
+    batch = ring.get_batch(16)
+    assert [frame.data for frame in batch] == [1, 2, 3]
+    assert ring.empty()
+    assert ring.reserve() is None
+    publish_thread = threading.Timer(0.05, publish, args=(ring, 4))
+    # the blocking call releases the batch before it waits, so the producer gets a slot
+    publish_thread.start()
+    assert [frame.data for frame in ring.get_batch(16)] == [4]
+    publish_thread.join()
+
+
+def test_batch_limited_to_max_n():
+    ring = dali_usb.SPSCRing(8)
+    publish(ring, 1, 2, 3, 4, 5)
+    assert [frame.data for frame in ring.get_batch(2)] == [1, 2]
+    assert [frame.data for frame in ring.get_batch(2)] == [3, 4]
+    assert [frame.data for frame in ring.get_batch(2)] == [5]
+
+
+@pytest.mark.parametrize("offset", range(0, 4))
+def test_batch_wraps_around(offset):
+    ring = dali_usb.SPSCRing(4)
+    # move head and tail to offset before filling the ring
+    for value in range(offset):
+        publish(ring, value)
+        ring.get()
+    ring.clear()
+    publish(ring, 10, 11, 12)
+    assert [frame.data for frame in ring.get_batch(16)] == [10, 11, 12]
+
+
+def test_clear_releases_held_slots():
+    ring = dali_usb.SPSCRing(4)
+    publish(ring, 1, 2, 3)
+    ring.get()
+    ring.clear()
+    assert ring.empty()
+    # all slots but one are free again, including the one handed out before
+    publish(ring, 4, 5, 6)
+    assert ring.reserve() is None
+    assert [frame.data for frame in ring.get_batch(16)] == [4, 5, 6]
+
+
+@pytest.mark.parametrize("max_n", [1, 3, 16])
+def test_threaded_order(max_n):
+    count = 5000
+    ring = dali_usb.SPSCRing(8)
+
+    def producer():
+        value = 0
+        while value < count:
+            slot = ring.reserve()
+            if slot is None:
+                time.sleep(0)
+                continue
+            slot.data = value
+            ring.publish()
+            value += 1
+
+    thread = threading.Thread(target=producer)
+    thread.daemon = True
+    thread.start()
+    received = []
+    while len(received) < count:
+        batch = ring.get_batch(max_n)
+        assert 0 < len(batch) <= max_n
+        received += [frame.data for frame in batch]
+    thread.join()
+    assert received == list(range(count))